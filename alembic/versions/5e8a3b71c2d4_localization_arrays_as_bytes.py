@@ -0,0 +1,81 @@
+"""localization arrays as bytes
+
+Revision ID: 5e8a3b71c2d4
+Revises: 7f1c2d9b4e05
+Create Date: 2026-10-15 12:31:54.902118
+
+"""
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8a3b71c2d4'
+down_revision = '7f1c2d9b4e05'
+branch_labels = None
+depends_on = None
+
+
+# column name, raw byte dtype, array type, nullable
+COLUMNS = [
+    ('uniq', '<i8', sa.ARRAY(sa.BigInteger()), False),
+    ('probdensity', '<f4', sa.ARRAY(sa.Float()), False),
+    ('distmu', '<f4', sa.ARRAY(sa.Float()), True),
+    ('distsigma', '<f4', sa.ARRAY(sa.Float()), True),
+    ('distnorm', '<f4', sa.ARRAY(sa.Float()), True),
+]
+
+
+def convert_columns(new_type, convert):
+    """Rewrite every skymap array column of the localizations table into a
+    column of new_type, converting the values row by row."""
+
+    for name, _, _, _ in COLUMNS:
+        op.add_column(
+            'localizations', sa.Column(f'{name}_new', new_type(name), nullable=True)
+        )
+
+    conn = op.get_bind()
+    names = [name for name, _, _, _ in COLUMNS]
+    ids = conn.execute(sa.text('SELECT id FROM localizations')).scalars().all()
+    for id in ids:
+        row = conn.execute(
+            sa.text(f'SELECT {", ".join(names)} FROM localizations WHERE id = :id'),
+            {'id': id},
+        ).first()
+        values = {
+            name: None if value is None else convert(name, value)
+            for name, value in zip(names, row)
+        }
+        assignments = ', '.join(f'{name}_new = :{name}' for name in names)
+        conn.execute(
+            sa.text(f'UPDATE localizations SET {assignments} WHERE id = :id'),
+            {'id': id, **values},
+        )
+
+    for name, _, _, nullable in COLUMNS:
+        op.drop_column('localizations', name)
+        op.alter_column(
+            'localizations',
+            f'{name}_new',
+            new_column_name=name,
+            nullable=nullable,
+        )
+
+
+def upgrade():
+    dtypes = {name: dtype for name, dtype, _, _ in COLUMNS}
+    convert_columns(
+        lambda name: sa.LargeBinary(),
+        lambda name, value: np.asarray(value, dtype=dtypes[name]).tobytes(),
+    )
+
+
+def downgrade():
+    dtypes = {name: dtype for name, dtype, _, _ in COLUMNS}
+    types = {name: array_type for name, _, array_type, _ in COLUMNS}
+    convert_columns(
+        lambda name: types[name],
+        lambda name, value: np.frombuffer(value, dtype=dtypes[name]).tolist(),
+    )
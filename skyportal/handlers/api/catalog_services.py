@@ -160,10 +160,10 @@ def fetch_transients(allocation_id, user_id, group_ids, payload):
             )
         ).first()
 
-        healpix = localization.flat_2d
-        ra_center, dec_center = get_conesearch_centers(
-            healpix, level=payload['localizationCumprob']
+        tiles = localization.credible_region_tiles(
+            confidence=payload['localizationCumprob']
         )
+        ra_center, dec_center = get_conesearch_centers(tiles)
 
         start_date = Time(arrow.get(payload['startDate'].strip()).datetime)
         end_date = Time(arrow.get(payload['endDate'].strip()).datetime)
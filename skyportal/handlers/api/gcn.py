@@ -5,7 +5,6 @@ import ast
 from astropy.time import Time
 from astropy.table import Table
 import binascii
-import healpy as hp
 import io
 import os
 import gcn
@@ -86,6 +85,7 @@ from ...utils.gcn import (
     from_cone,
     from_polygon,
 )
+from ...utils.healpix import reorder
 
 from skyportal.models.gcn import SOURCE_RADIUS_THRESHOLD
 
@@ -832,6 +832,9 @@ class GcnEventHandler(BaseHandler):
                             joinedload(GcnEvent.localizations).joinedload(
                                 Localization.properties
                             ),
+                            joinedload(GcnEvent.localizations).undefer(
+                                Localization.contour_nfeatures
+                            ),
                             joinedload(GcnEvent.gcn_notices),
                             joinedload(GcnEvent.observationplan_requests)
                             .joinedload(ObservationPlanRequest.allocation)
@@ -846,6 +849,8 @@ class GcnEventHandler(BaseHandler):
                 if event is None:
                     return self.error("GCN event not found", status=404)
 
+                centers = Localization.centers(event.localizations)
+
                 data = {
                     **event.to_dict(),
                     "tags": list(set(event.tags)),
@@ -859,9 +864,9 @@ class GcnEventHandler(BaseHandler):
                                     properties.to_dict()
                                     for properties in loc.properties
                                 ],
-                                "center": loc.center,
+                                "center": center,
                             }
-                            for loc in event.localizations
+                            for loc, center in zip(event.localizations, centers)
                         ),
                         key=lambda x: x["created_at"],
                         reverse=True,
@@ -905,7 +910,9 @@ class GcnEventHandler(BaseHandler):
             query = GcnEvent.select(
                 session.user_or_token,
                 options=[
-                    joinedload(GcnEvent.localizations),
+                    joinedload(GcnEvent.localizations).undefer(
+                        Localization.contour_nfeatures
+                    ),
                     joinedload(GcnEvent.gcn_notices),
                     joinedload(GcnEvent.observationplan_requests),
                 ],
@@ -1146,6 +1153,8 @@ def add_tiles_and_properties_and_observation_plans(localization_id, user_id):
         )
         user = session.scalar(sa.select(User).where(User.id == user_id))
 
+        localization.calc_center()
+
         properties_dict, tags_list = get_skymap_properties(localization)
 
         properties = LocalizationProperty(
@@ -1167,7 +1176,9 @@ def add_tiles_and_properties_and_observation_plans(localization_id, user_id):
             LocalizationTile(
                 localization_id=localization.id, healpix=uniq, probdensity=probdensity
             )
-            for uniq, probdensity in zip(localization.uniq, localization.probdensity)
+            for uniq, probdensity in zip(
+                localization.uniq.tolist(), localization.probdensity.tolist()
+            )
         ]
 
         session.add(localization)
@@ -2419,7 +2430,7 @@ class LocalizationCrossmatchHandler(BaseHandler):
                 skymap = skymap1 * skymap2
                 skymap = skymap / np.sum(skymap)
 
-                skymap = hp.reorder(skymap, 'RING', 'NESTED')
+                skymap = reorder(skymap, r2n=True)
                 skymap = ligo_bayestar.derasterize(Table([skymap], names=['PROB']))
                 with tempfile.NamedTemporaryFile(suffix='.fits') as fitsfile:
                     ligo.skymap.io.write_sky_map(
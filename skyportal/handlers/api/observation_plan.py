@@ -69,6 +69,7 @@ from ...models import (
     User,
 )
 from ...models.schema import ObservationPlanPost
+from ...utils.healpix import reorder
 from ...utils.simsurvey import (
     get_simsurvey_parameters,
     random_parameters_notheta,
@@ -2173,7 +2174,7 @@ def observation_simsurvey(
 
         if {'DISTMU', 'DISTSIGMA', 'DISTNORM'}.issubset(set(t.colnames)):
             result = t['PROB'], t['DISTMU'], t['DISTSIGMA'], t['DISTNORM']
-            hp_data = hp.reorder(result, 'NESTED', 'RING')
+            hp_data = reorder(result)
             map_struct = {}
             map_struct['prob'] = hp_data[0]
             map_struct['distmu'] = hp_data[1]
@@ -2191,7 +2192,7 @@ def observation_simsurvey(
             )
         else:
             result = t['PROB']
-            hp_data = hp.reorder(result, 'NESTED', 'RING')
+            hp_data = reorder(result)
             map_struct = {}
             map_struct['prob'] = hp_data
             distance_lower = astropy.coordinates.Distance(1 * u.Mpc)
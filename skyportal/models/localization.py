@@ -6,25 +6,106 @@ __all__ = [
 ]
 
 import sqlalchemy as sa
-from sqlalchemy.orm import relationship, deferred
+from sqlalchemy.orm import (
+    relationship,
+    deferred,
+    reconstructor,
+    object_session,
+    column_property,
+)
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.hybrid import hybrid_property
 
+import astropy.units as u
+from astropy.coordinates import SkyCoord
 from astropy.table import Table
 import dustmaps.sfd
-from dustmaps.config import config
 import numpy as np
-import ligo.skymap.postprocess
-import ligo.skymap.bayestar as ligo_bayestar
+import ligo.skymap.moc
 import healpy
 import healpix_alchemy
 
 from baselayer.app.models import Base, AccessibleIfUserMatches
-from baselayer.app.env import load_env
 
+from ..utils.healpix import nest2ring_table, rasterize, rasterize_3d
+
+
+# SFD dust map query, opened once per process on first use;
+# False if the dust maps could not be loaded
+_SFD_QUERY = None
+
+
+def _sfd_query():
+    """Get the process-wide SFD dust map query, or None if unavailable."""
+    global _SFD_QUERY
+    if _SFD_QUERY is None:
+        try:
+            _SFD_QUERY = dustmaps.sfd.SFDQuery()
+        except Exception:
+            _SFD_QUERY = False
+    return _SFD_QUERY or None
+
+
+def _compute_centers(localizations):
+    """Compute information about the centers of several localizations.
+
+    The posterior maximum is found for each localization in turn, while the
+    coordinate transformations and the dust map lookup are done in a single
+    vectorized call over all of the localizations.
+    """
+    coords = SkyCoord([localization.posterior_max() for localization in localizations])
+    galactic = coords.galactic
+
+    ebvs = [None] * len(localizations)
+    sfd_query = _sfd_query()
+    if sfd_query is not None:
+        try:
+            ebvs = [float(ebv) for ebv in sfd_query(coords)]
+        except Exception:
+            pass
+
+    return [
+        {
+            "ra": float(ra),
+            "dec": float(dec),
+            "gal_lat": float(gal_lat),
+            "gal_lon": float(gal_lon),
+            "ebv": ebv,
+        }
+        for ra, dec, gal_lat, gal_lon, ebv in zip(
+            coords.ra.deg, coords.dec.deg, galactic.b.deg, galactic.l.deg, ebvs
+        )
+    ]
+
+
+class _NumpyArray(sa.types.TypeDecorator):
+    """SQLAlchemy representation of a NumPy array, stored as the raw bytes
+    of its buffer so that loading it is a single copy."""
+
+    impl = sa.LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return np.asarray(value, dtype=self.dtype).tobytes()
 
-_, cfg = load_env()
-config['data_dir'] = cfg['misc.dustmap_folder']
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return np.frombuffer(value, dtype=self.dtype)
+
+
+class Int64Array(_NumpyArray):
+    """SQLAlchemy representation of a NumPy int64 array."""
+
+    dtype = np.dtype('<i8')
+
+
+class Float32Array(_NumpyArray):
+    """SQLAlchemy representation of a NumPy float32 array."""
+
+    dtype = np.dtype('<f4')
 
 
 class Localization(Base):
@@ -66,7 +147,7 @@ class Localization(Base):
 
     uniq = deferred(
         sa.Column(
-            sa.ARRAY(sa.BigInteger),
+            Int64Array,
             nullable=False,
             doc='Multiresolution HEALPix UNIQ pixel index array',
         )
@@ -74,31 +155,53 @@ class Localization(Base):
 
     probdensity = deferred(
         sa.Column(
-            sa.ARRAY(sa.Float),
+            Float32Array,
             nullable=False,
             doc='Multiresolution HEALPix probability density array',
         )
     )
 
     distmu = deferred(
-        sa.Column(sa.ARRAY(sa.Float), doc='Multiresolution HEALPix distance mu array')
+        sa.Column(Float32Array, doc='Multiresolution HEALPix distance mu array')
     )
 
     distsigma = deferred(
-        sa.Column(
-            sa.ARRAY(sa.Float), doc='Multiresolution HEALPix distance sigma array'
-        )
+        sa.Column(Float32Array, doc='Multiresolution HEALPix distance sigma array')
     )
 
     distnorm = deferred(
         sa.Column(
-            sa.ARRAY(sa.Float),
+            Float32Array,
             doc='Multiresolution HEALPix distance normalization array',
         )
     )
 
     contour = deferred(sa.Column(JSONB, doc='GeoJSON contours'))
 
+    center_ra = sa.Column(
+        sa.Float, doc='Right ascension of the posterior maximum [deg]'
+    )
+
+    center_dec = sa.Column(sa.Float, doc='Declination of the posterior maximum [deg]')
+
+    center_gal_l = sa.Column(
+        sa.Float, doc='Galactic longitude of the posterior maximum [deg]'
+    )
+
+    center_gal_b = sa.Column(
+        sa.Float, doc='Galactic latitude of the posterior maximum [deg]'
+    )
+
+    center_ebv = sa.Column(sa.Float, doc='SFD E(B-V) at the posterior maximum')
+
+    is_3d_flag = sa.Column(
+        sa.Boolean,
+        nullable=False,
+        server_default=sa.false(),
+        index=True,
+        doc='Whether the distance arrays are provided',
+    )
+
     observationplan_requests = relationship(
         'ObservationPlanRequest',
         back_populates='localization',
@@ -131,28 +234,29 @@ class Localization(Base):
         doc="Tags associated with this Localization.",
     )
 
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # record whether the skymap has distance information, so that
+        # is_3d does not have to load the deferred distance arrays
+        self.is_3d_flag = all(
+            kwargs.get(key) is not None for key in ('distmu', 'distsigma', 'distnorm')
+        )
+
     @hybrid_property
     def is_3d(self):
-        return (
-            self.distmu is not None
-            and self.distsigma is not None
-            and self.distnorm is not None
-        )
+        return self.is_3d_flag
 
     @is_3d.expression
     def is_3d(cls):
-        return sa.and_(
-            cls.distmu.isnot(None),
-            cls.distsigma.isnot(None),
-            cls.distnorm.isnot(None),
-        )
+        return cls.is_3d_flag
 
     @property
     def table_2d(self):
         """Get multiresolution HEALPix dataset, probability density only."""
         return Table(
-            [np.asarray(self.uniq, dtype=np.int64), self.probdensity],
+            [self.uniq, self.probdensity],
             names=['UNIQ', 'PROBDENSITY'],
+            copy=False,
         )
 
     @property
@@ -162,56 +266,222 @@ class Localization(Base):
         if self.is_3d:
             return Table(
                 [
-                    np.asarray(self.uniq, dtype=np.int64),
+                    self.uniq,
                     self.probdensity,
                     self.distmu,
                     self.distsigma,
                     self.distnorm,
                 ],
                 names=['UNIQ', 'PROBDENSITY', 'DISTMU', 'DISTSIGMA', 'DISTNORM'],
+                copy=False,
             )
         else:
             return self.table_2d
 
+    @reconstructor
+    def init_on_load(self):
+        """
+        This is called when the object
+        is loaded from the database.
+        ref: https://docs.sqlalchemy.org/en/14/orm/constructors.html
+        """
+        # rasterized maps are computed lazily and cached on the instance
+        self._flat_2d = None
+        self._flat = None
+
     @property
     def flat_2d(self):
-        """Get flat resolution HEALPix dataset, probability density only."""
-        order = healpy.nside2order(Localization.nside)
-        result = ligo_bayestar.rasterize(self.table_2d, order)['PROB']
-        return healpy.reorder(result, 'NESTED', 'RING')
+        """Get flat resolution HEALPix dataset, probability density only.
+
+        The result is cached on the instance and must not be modified.
+        """
+        if getattr(self, '_flat_2d', None) is None:
+            # the float32 column is rasterized in float64, so that sums over
+            # the map (e.g., credible levels) do not accumulate rounding error
+            (self._flat_2d,) = rasterize(
+                self.uniq,
+                [self.probdensity.astype(np.float64) * _PIXAREA],
+                _ORDER,
+                nest2ring_table(_ORDER),
+            )
+        return self._flat_2d
 
     @property
     def flat(self):
         """Get flat resolution HEALPix dataset, probability density and
-        distance."""
-        if self.is_3d:
-            order = healpy.nside2order(Localization.nside)
-            t = ligo_bayestar.rasterize(self.table, order)
-            result = t['PROB'], t['DISTMU'], t['DISTSIGMA'], t['DISTNORM']
-            return healpy.reorder(result, 'NESTED', 'RING')
-        else:
-            return (self.flat_2d,)
+        distance.
+
+        The result is cached on the instance and must not be modified.
+        """
+        if getattr(self, '_flat', None) is None:
+            if self.is_3d:
+                # reuse the probability map already rasterized by flat_2d,
+                # or rasterize it in the same pass and share it with flat_2d
+                self._flat_2d, *dist = rasterize_3d(
+                    self.uniq,
+                    self.probdensity,
+                    self.distmu,
+                    self.distsigma,
+                    self.distnorm,
+                    _ORDER,
+                    nest2ring_table(_ORDER),
+                    prob=getattr(self, '_flat_2d', None),
+                )
+                self._flat = (self._flat_2d, *dist)
+            else:
+                self._flat = (self.flat_2d,)
+        return self._flat
 
     @property
     def center(self):
         """Get information about the center of the localization."""
 
-        prob = self.flat_2d
-        coord = ligo.skymap.postprocess.posterior_max(prob)
+        if self.center_ra is None:
+            # not stored at ingest (e.g., localizations added before the
+            # center columns existed), so compute it on the fly
+            return self.compute_center()
+
+        return {
+            "ra": self.center_ra,
+            "dec": self.center_dec,
+            "gal_lat": self.center_gal_b,
+            "gal_lon": self.center_gal_l,
+            "ebv": self.center_ebv,
+        }
+
+    def posterior_max(self):
+        """Get the sky position of the tile with the highest probability
+        density.
+
+        This is read from the probability density index of the
+        LocalizationTile table when the tiles exist, and otherwise from
+        the multiresolution arrays, without rasterizing the skymap.
+        """
+        session = object_session(self)
+        healpix = None
+        if session is not None and self.id is not None:
+            healpix = session.scalar(
+                sa.select(LocalizationTile.healpix)
+                .where(LocalizationTile.localization_id == self.id)
+                .order_by(LocalizationTile.probdensity.desc())
+                .limit(1)
+            )
 
-        center_info = {}
-        center_info["ra"] = coord.ra.deg
-        center_info["dec"] = coord.dec.deg
-        center_info["gal_lat"] = coord.galactic.b.deg
-        center_info["gal_lon"] = coord.galactic.l.deg
+        if healpix is not None:
+            # tiles are stored as ranges of NESTED pixels at the
+            # healpix_alchemy resolution; both bounds are multiples of
+            # the tile size, which is a power of 4
+            shift = (healpix.upper - healpix.lower).bit_length() - 1
+            order = healpix_alchemy.constants.LEVEL - shift // 2
+            ipix = healpix.lower >> shift
+        else:
+            uniq = self.uniq[np.argmax(self.probdensity)]
+            order, ipix = ligo.skymap.moc.uniq2nest(uniq)
 
-        try:
-            ebv = float(dustmaps.sfd.SFDQuery()(coord))
-        except Exception:
-            ebv = None
-        center_info["ebv"] = ebv
+        ra, dec = healpy.pix2ang(
+            healpy.order2nside(int(order)), int(ipix), nest=True, lonlat=True
+        )
+        return SkyCoord(ra * u.deg, dec * u.deg)
+
+    def credible_region_tiles(self, confidence=0.9):
+        """Get the tiles of the smallest credible region containing the
+        given probability.
+
+        The cumulative probability is summed by the database over the
+        LocalizationTile table, in order of decreasing probability density,
+        so the skymap is never rasterized. Tiles of equal probability
+        density are summed one at a time, so that the region of a uniform
+        skymap is not empty.
+
+        Parameters
+        ----------
+        confidence : float
+            Cumulative probability of the credible region.
+
+        Returns
+        -------
+        list
+            healpix_alchemy tiles (ranges of NESTED pixels) in the region.
+        """
+
+        cum_prob = (
+            sa.func.sum(LocalizationTile.probdensity * LocalizationTile.healpix.area)
+            .over(
+                order_by=(
+                    LocalizationTile.probdensity.desc(),
+                    LocalizationTile.healpix,
+                ),
+                rows=(None, 0),
+            )
+            .label('cum_prob')
+        )
+        localizationtile_subquery = (
+            sa.select(LocalizationTile.healpix, cum_prob).where(
+                LocalizationTile.localization_id == self.id
+            )
+        ).subquery()
 
-        return center_info
+        return (
+            object_session(self)
+            .scalars(
+                sa.select(localizationtile_subquery.columns.healpix).where(
+                    localizationtile_subquery.columns.cum_prob <= confidence
+                )
+            )
+            .all()
+        )
+
+    def compute_center(self):
+        """Compute information about the center of the localization."""
+
+        return _compute_centers([self])[0]
+
+    @classmethod
+    def centers(cls, localizations):
+        """Get information about the centers of several localizations.
+
+        Centers stored at ingest are read directly; the remaining ones are
+        computed together so that the dust map is queried only once.
+        """
+
+        centers = [
+            None if localization.center_ra is None else localization.center
+            for localization in localizations
+        ]
+        missing = [i for i, center in enumerate(centers) if center is None]
+        if missing:
+            computed = _compute_centers([localizations[i] for i in missing])
+            for i, center in zip(missing, computed):
+                centers[i] = center
+
+        return centers
+
+    def calc_center(self):
+        """Compute the center of the localization and store it in the
+        center columns."""
+
+        center_info = self.compute_center()
+        self.center_ra = center_info["ra"]
+        self.center_dec = center_info["dec"]
+        self.center_gal_b = center_info["gal_lat"]
+        self.center_gal_l = center_info["gal_lon"]
+        self.center_ebv = center_info["ebv"]
+
+
+# number of GeoJSON features in the contour, computed by the database so
+# that checking for a contour does not fetch and parse the whole document
+Localization.contour_nfeatures = column_property(
+    sa.func.jsonb_array_length(Localization.__table__.c.contour['features']),
+    deferred=True,
+    doc='Number of features in the GeoJSON contours',
+)
+
+
+# flat map resolution, computed once rather than on every rasterization; the
+# NESTED to RING permutation is built on first use by nest2ring_table
+_NSIDE = Localization.nside
+_ORDER = healpy.nside2order(_NSIDE)
+_PIXAREA = healpy.nside2pixarea(_NSIDE)
 
 
 class LocalizationTile(Base):
@@ -221,14 +491,12 @@ class LocalizationTile(Base):
     localization_id = sa.Column(
         sa.ForeignKey('localizations.id', ondelete="CASCADE"),
         primary_key=True,
-        index=True,
         doc='localization ID',
     )
 
     probdensity = sa.Column(
         sa.Float,
         nullable=False,
-        index=True,
         doc="Probability density for the tile",
     )
 
@@ -236,11 +504,13 @@ class LocalizationTile(Base):
 
 
 LocalizationTile.__table_args__ = (
+    # tiles are always queried per localization in order of decreasing
+    # probability density (posterior maximum, credible regions); the index
+    # also serves lookups by localization_id alone
     sa.Index(
-        'localizationtile_id_healpix_index',
-        LocalizationTile.id,
-        LocalizationTile.healpix,
-        unique=True,
+        'localizationtile_loc_probdensity_idx',
+        LocalizationTile.localization_id,
+        LocalizationTile.probdensity.desc(),
     ),
 )
 
@@ -16,6 +16,8 @@ import healpix_alchemy
 
 from baselayer.app.models import Base
 
+from ..utils.healpix import reorder
+
 
 class SpatialCatalog(Base):
     """Spatial catalog information, composed of SpatialCatalogEntry's"""
@@ -97,7 +99,7 @@ class SpatialCatalogEntry(Base):
         """Get flat resolution HEALPix dataset, probability density only."""
         order = healpy.nside2order(SpatialCatalogEntry.nside)
         result = ligo_bayestar.rasterize(self.table, order)['PROB']
-        return healpy.reorder(result, 'NESTED', 'RING')
+        return reorder(result)
 
 
 class SpatialCatalogEntryTile(Base):
@@ -1,7 +1,14 @@
 import os
 import numpy as np
+import astropy.units as u
+import healpy as hp
+import healpix_alchemy as ha
+import ligo.skymap.moc
+import sqlalchemy as sa
 
+from skyportal.models import DBSession, Localization, LocalizationTile
 from skyportal.tests import api
+from skyportal.utils.catalog import get_conesearch_centers, tesselation_spiral
 from skyportal.utils.gcn import from_url
 
 import time
@@ -221,6 +228,176 @@ def test_gcn_from_moc(super_admin_token, view_only_token):
     assert "2022-06-18T18:31:12" not in [event["dateobs"] for event in data['events']]
 
 
+def ingest_skymap(token, dateobs, skymap, tags):
+    """Post a skymap and wait for its tiles to be created, returning the ID
+    of its localization."""
+
+    event_data = {'dateobs': dateobs, 'skymap': skymap, 'tags': tags}
+
+    dateobs = dateobs.replace('T', ' ')
+    status, data = api('GET', f'gcn_event/{dateobs}', token=token)
+    if status == 404:
+        status, data = api('POST', 'gcn_event', data=event_data, token=token)
+        assert status == 200
+        assert data['status'] == 'success'
+
+    status, data = api('GET', f'gcn_event/{dateobs}', token=token)
+    assert status == 200
+    localization_id = next(
+        loc['id']
+        for loc in data['data']['localizations']
+        if loc['localization_name'] == skymap['localization_name']
+    )
+
+    # wait for the tiles to be added
+    for _ in range(10):
+        ntiles = DBSession().scalar(
+            sa.select(sa.func.count()).where(
+                LocalizationTile.localization_id == localization_id
+            )
+        )
+        if ntiles > 0:
+            break
+        time.sleep(5)
+    assert ntiles > 0
+
+    return localization_id
+
+
+def ingest_ipn_skymap(token):
+    """Post the IPN skymap, returning the skymap and the ID of its
+    localization."""
+
+    skymap = from_url(
+        f'{os.path.dirname(__file__)}/../data/GRB220617A_IPN_map_hpx.fits.gz'
+    )
+    localization_id = ingest_skymap(
+        token, '2022-06-18T18:31:12', skymap, ['IPN', 'GRB']
+    )
+
+    return skymap, localization_id
+
+
+def assert_at_posterior_max(skymap, ra, dec):
+    """Check that (ra, dec) lies in a tile of highest probability density."""
+
+    probdensity = np.asarray(skymap['probdensity'])
+    order, ipix = ligo.skymap.moc.uniq2nest(np.asarray(skymap['uniq']))
+    inside = ipix == hp.ang2pix(2**order, ra, dec, nest=True, lonlat=True)
+    assert inside.sum() == 1
+    assert np.isclose(probdensity[inside][0], probdensity.max(), rtol=1e-6)
+
+
+def test_localization_center(super_admin_token):
+
+    skymap, localization_id = ingest_ipn_skymap(super_admin_token)
+
+    # center stored at ingest
+    dateobs = "2022-06-18 18:31:12"
+    status, data = api('GET', f'gcn_event/{dateobs}', token=super_admin_token)
+    assert status == 200
+    center = next(
+        loc['center']
+        for loc in data['data']['localizations']
+        if loc['id'] == localization_id
+    )
+    assert_at_posterior_max(skymap, center['ra'], center['dec'])
+    assert -90 <= center['gal_lat'] <= 90
+
+    # top tile read from the database
+    localization = DBSession().scalar(
+        sa.select(Localization).where(Localization.id == localization_id)
+    )
+    coord = localization.posterior_max()
+    assert_at_posterior_max(skymap, coord.ra.deg, coord.dec.deg)
+
+    # no tiles to read, so from the multiresolution arrays
+    localization = Localization(
+        uniq=np.asarray(skymap['uniq'], dtype=np.int64),
+        probdensity=np.asarray(skymap['probdensity'], dtype=np.float32),
+    )
+    coord = localization.posterior_max()
+    assert_at_posterior_max(skymap, coord.ra.deg, coord.dec.deg)
+
+
+def test_credible_region_conesearch_centers(super_admin_token):
+
+    _, localization_id = ingest_ipn_skymap(super_admin_token)
+
+    session = DBSession()
+    localization = session.scalar(
+        sa.select(Localization).where(Localization.id == localization_id)
+    )
+    tiles = localization.credible_region_tiles(confidence=0.9)
+    assert len(tiles) > 0
+
+    # the region is made of the tiles of highest probability density, up to
+    # the requested probability
+    region = {(tile.lower, tile.upper) for tile in tiles}
+    all_tiles = session.execute(
+        sa.select(LocalizationTile.healpix, LocalizationTile.probdensity).where(
+            LocalizationTile.localization_id == localization_id
+        )
+    ).all()
+    inside = [
+        (healpix, probdensity)
+        for healpix, probdensity in all_tiles
+        if (healpix.lower, healpix.upper) in region
+    ]
+    outside = [
+        probdensity
+        for healpix, probdensity in all_tiles
+        if (healpix.lower, healpix.upper) not in region
+    ]
+    assert len(inside) == len(tiles)
+    assert min(probdensity for _, probdensity in inside) >= max(outside)
+    prob = sum(
+        probdensity * (healpix.upper - healpix.lower) * ha.constants.PIXEL_AREA
+        for healpix, probdensity in inside
+    )
+    assert prob <= 0.9 or np.isclose(prob, 0.9)
+
+    # the cone search centers are the points of the spiral inside the region
+    ras, decs = get_conesearch_centers(tiles)
+    all_ras, all_decs = tesselation_spiral(1.0, scale=0.80)
+    ipix = ha.constants.HPX.lonlat_to_healpix(all_ras * u.deg, all_decs * u.deg)
+    in_region = np.zeros(len(ipix), dtype=bool)
+    for tile in tiles:
+        in_region |= (tile.lower <= ipix) & (ipix < tile.upper)
+    assert in_region.any()
+    np.testing.assert_array_equal(ras, all_ras[in_region])
+    np.testing.assert_array_equal(decs, all_decs[in_region])
+
+
+def test_credible_region_of_uniform_skymap(super_admin_token):
+
+    skymap = {
+        'polygon': [(30.0, 60.0), (40.0, 60.0), (40.0, 70.0), (30.0, 70.0)],
+        'localization_name': str(uuid.uuid4()),
+    }
+    localization_id = ingest_skymap(
+        super_admin_token, '2022-09-05T01:02:03', skymap, ['IPN', 'GRB']
+    )
+
+    session = DBSession()
+    localization = session.scalar(
+        sa.select(Localization).where(Localization.id == localization_id)
+    )
+    ntiles = session.scalar(
+        sa.select(sa.func.count()).where(
+            LocalizationTile.localization_id == localization_id
+        )
+    )
+
+    # every tile has the same probability, so the region is made of 90% of
+    # the tiles rather than none of them
+    tiles = localization.credible_region_tiles(confidence=0.9)
+    assert abs(len(tiles) - 0.9 * ntiles) <= 1
+
+    ras, decs = get_conesearch_centers(tiles)
+    assert len(ras) > 0
+
+
 @pytest.mark.flaky(reruns=3)
 def test_gcn_summary_sources(
     super_admin_user,
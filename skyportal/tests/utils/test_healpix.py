@@ -0,0 +1,181 @@
+import os
+import subprocess
+import sys
+
+import healpy
+import numpy as np
+import pytest
+from numba import cuda
+from astropy.table import Table
+import ligo.skymap.bayestar as ligo_bayestar
+import ligo.skymap.distance
+import ligo.skymap.moc
+
+from skyportal.utils import healpix
+from skyportal.utils.healpix import nest2ring_table, rasterize, rasterize_3d, reorder
+
+
+def multiorder_skymap(rng):
+    """Build a full-sky multi-order map mixing orders 2, 3 and 5."""
+    uniq = []
+    for ipix in range(healpy.nside2npix(healpy.order2nside(2))):
+        if ipix % 3 == 0:
+            uniq.append(ligo.skymap.moc.nest2uniq(2, ipix))
+        elif ipix % 3 == 1:
+            children = 4 * ipix + np.arange(4)
+            uniq.extend(ligo.skymap.moc.nest2uniq(3, children))
+        else:
+            children = 64 * ipix + np.arange(64)
+            uniq.extend(ligo.skymap.moc.nest2uniq(5, children))
+    uniq = np.asarray(uniq, dtype=np.int64)
+    distmu = rng.uniform(100, 200, size=uniq.size)
+    distsigma = rng.uniform(10, 50, size=uniq.size)
+    _, _, distnorm = ligo.skymap.distance.parameters_to_moments(distmu, distsigma)
+    return Table(
+        [uniq, rng.uniform(size=uniq.size), distmu, distsigma, distnorm],
+        names=['UNIQ', 'PROBDENSITY', 'DISTMU', 'DISTSIGMA', 'DISTNORM'],
+    )
+
+
+def test_rasterize_matches_ligo_skymap():
+    rng = np.random.default_rng(0)
+    skymap = multiorder_skymap(rng)
+    order = 4
+    nest2ring = nest2ring_table(order)
+
+    (prob,) = rasterize(
+        skymap['UNIQ'],
+        [skymap['PROBDENSITY'] * healpy.nside2pixarea(healpy.order2nside(order))],
+        order,
+        nest2ring,
+    )
+
+    expected = ligo_bayestar.rasterize(skymap['UNIQ', 'PROBDENSITY'], order)
+    np.testing.assert_allclose(prob, healpy.reorder(expected['PROB'], 'NESTED', 'RING'))
+
+
+# order 4 averages the order 5 tiles, order 5 does not
+@pytest.mark.parametrize('order', [4, 5])
+def test_rasterize_3d_matches_ligo_skymap(order):
+    rng = np.random.default_rng(0)
+    skymap = multiorder_skymap(rng)
+    columns = ['PROBDENSITY', 'DISTMU', 'DISTSIGMA', 'DISTNORM']
+    nest2ring = nest2ring_table(order)
+
+    result = rasterize_3d(
+        skymap['UNIQ'], *(skymap[name] for name in columns), order, nest2ring
+    )
+
+    expected = ligo_bayestar.rasterize(skymap, order)
+    for layer, name in zip(result, ['PROB', 'DISTMU', 'DISTSIGMA', 'DISTNORM']):
+        np.testing.assert_allclose(
+            layer, healpy.reorder(expected[name], 'NESTED', 'RING'), rtol=1e-6
+        )
+
+    # an already rasterized probability map is reused as is
+    reused = rasterize_3d(
+        skymap['UNIQ'],
+        *(skymap[name] for name in columns),
+        order,
+        nest2ring,
+        prob=result[0],
+    )
+    assert reused[0] is result[0]
+    for layer, expected_layer in zip(reused[1:], result[1:]):
+        np.testing.assert_allclose(layer, expected_layer)
+
+
+def test_rasterize_partial_sky_is_zero_outside():
+    order = 3
+    nest2ring = nest2ring_table(order)
+    nside = healpy.order2nside(order)
+    uniq = ligo.skymap.moc.nest2uniq(2, np.array([0, 5]))
+
+    (result,) = rasterize(uniq, [[1.0, 2.0]], order, nest2ring)
+
+    nest = np.zeros(healpy.nside2npix(nside))
+    nest[0:4] = 1.0
+    nest[20:24] = 2.0
+    ring2nest = healpy.ring2nest(nside, np.arange(nest.size))
+    np.testing.assert_array_equal(result, nest[ring2nest])
+
+
+def test_rasterize_keeps_float32():
+    rng = np.random.default_rng(1)
+    skymap = multiorder_skymap(rng)
+    order = 4
+    nest2ring = nest2ring_table(order)
+    values = np.asarray([skymap['DISTMU']])
+
+    (result32,) = rasterize(skymap['UNIQ'], values.astype(np.float32), order, nest2ring)
+    (result64,) = rasterize(skymap['UNIQ'], values, order, nest2ring)
+
+    assert result32.dtype == np.float32
+    np.testing.assert_allclose(result32, result64, rtol=1e-6)
+
+
+def test_reorder_matches_healpy():
+    rng = np.random.default_rng(3)
+    maps = rng.uniform(size=(2, healpy.nside2npix(16)))
+
+    np.testing.assert_array_equal(
+        reorder(maps[0]), healpy.reorder(maps[0], 'NESTED', 'RING')
+    )
+    np.testing.assert_array_equal(
+        reorder(maps, r2n=True), healpy.reorder(maps, 'RING', 'NESTED')
+    )
+
+
+def test_nest2ring_table():
+    table = nest2ring_table(3)
+    expected = healpy.nest2ring(8, np.arange(healpy.nside2npix(8)))
+    np.testing.assert_array_equal(table, expected)
+    assert nest2ring_table(3) is table
+
+
+@pytest.mark.skipif(not cuda.is_available(), reason="CUDA is not available")
+def test_rasterize_cuda_matches_cpu(monkeypatch):
+    rng = np.random.default_rng(2)
+    skymap = multiorder_skymap(rng)
+    order = 4
+    nest2ring = nest2ring_table(order)
+    columns = [
+        skymap[name] for name in ['PROBDENSITY', 'DISTMU', 'DISTSIGMA', 'DISTNORM']
+    ]
+
+    monkeypatch.setattr(healpix, '_CUDA_AVAILABLE', False)
+    cpu = rasterize_3d(skymap['UNIQ'], *columns, order, nest2ring)
+    monkeypatch.setattr(healpix, '_CUDA_AVAILABLE', True)
+    gpu = rasterize_3d(skymap['UNIQ'], *columns, order, nest2ring)
+
+    for gpu_layer, cpu_layer in zip(gpu, cpu):
+        np.testing.assert_allclose(gpu_layer, cpu_layer, rtol=1e-6)
+
+
+def test_rasterize_cuda_simulator(tmp_path, monkeypatch):
+    # The CUDA simulator can only be enabled before numba.cuda is imported,
+    # so the kernel runs in a fresh interpreter.
+    rng = np.random.default_rng(3)
+    skymap = multiorder_skymap(rng)
+    values = np.stack([skymap['PROBDENSITY'], skymap['DISTMU']])
+    np.savez(tmp_path / 'skymap.npz', uniq=skymap['UNIQ'], values=values)
+    script = f"""
+import numpy as np
+from skyportal.utils import healpix
+
+healpix._CUDA_AVAILABLE = True
+skymap = np.load({str(tmp_path / 'skymap.npz')!r})
+out = healpix.rasterize(
+    skymap['uniq'], skymap['values'], 4, healpix.nest2ring_table(4)
+)
+np.save({str(tmp_path / 'out.npy')!r}, out)
+"""
+    subprocess.run(
+        [sys.executable, '-c', script],
+        check=True,
+        env={**os.environ, 'NUMBA_ENABLE_CUDASIM': '1'},
+    )
+
+    monkeypatch.setattr(healpix, '_CUDA_AVAILABLE', False)
+    expected = rasterize(skymap['UNIQ'], values, 4, nest2ring_table(4))
+    np.testing.assert_allclose(np.load(tmp_path / 'out.npy'), expected)
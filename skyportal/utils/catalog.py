@@ -3,6 +3,7 @@ from astropy import units as u
 from astropy.coordinates import SkyCoord
 from astropy.time import Time
 import healpy as hp
+import healpix_alchemy as ha
 import pandas as pd
 from penquins import Kowalski
 import requests
@@ -42,51 +43,28 @@ def tesselation_spiral(FOV, scale=0.80):
     return ra, dec
 
 
-def get_conesearch_centers(skymap, radius=1.0, level=0.95):
+def get_conesearch_centers(tiles, radius=1.0):
     """Return pointings for a set of cone searches inside a localization region.
-    skymap : numpy.array
-        Flattened 2D healpix skymap
+    tiles : list of healpix_alchemy tiles
+        Tiles of the localization region, e.g. from
+        Localization.credible_region_tiles
     radius : float
         Radius of the circle (in degrees) with which to tile the sphere
-    level : float
-        Cumulative probability up to which to include points
     """
 
     ras, decs = tesselation_spiral(radius, scale=0.80)
-    coords_dict_list = list({"ra": r, "dec": d} for r, d in zip(ras, decs))
-    coords_out = select_sources_in_level(coords_dict_list, skymap, level=level)
-    ra_out = np.array(list(c["ra"] for c in coords_out))
-    dec_out = np.array(list(c["dec"] for c in coords_out))
-
-    return ra_out, dec_out
-
-
-def select_sources_in_level(sources, skymap, level=0.95):
-    """Return sources inside a localization region.
-    sources : list of dict
-        Sources to test for inside skymap
-    skymap : numpy.array
-        Flattened 2D healpix skymap
-    level : float
-        Cumulative probability up to which to include points
-    """
-
-    i = np.flipud(np.argsort(skymap))
-    sorted_credible_levels = np.cumsum(skymap[i])
-    credible_levels = np.empty_like(sorted_credible_levels)
-    credible_levels[i] = sorted_credible_levels
-    npix = len(skymap)
-    nside = hp.npix2nside(npix)
-
-    sources_within = []
-    for s in sources:
-        ipix = hp.ang2pix(
-            nside, 0.5 * np.pi - np.deg2rad(s["dec"]), np.deg2rad(s["ra"])
-        )
-        if credible_levels[ipix] <= level:
-            sources_within.append(s)
-
-    return sources_within
+    if len(tiles) == 0:
+        return ras[:0], decs[:0]
+    ipix = ha.constants.HPX.lonlat_to_healpix(ras * u.deg, decs * u.deg)
+
+    # the tiles do not overlap, so each point can only fall within the
+    # last tile starting at or before it
+    lower = np.sort([tile.lower for tile in tiles])
+    upper = np.sort([tile.upper for tile in tiles])
+    j = np.searchsorted(lower, ipix, side='right') - 1
+    inside = (j >= 0) & (ipix < upper[np.maximum(j, 0)])
+
+    return ras[inside], decs[inside]
 
 
 def query_kowalski(
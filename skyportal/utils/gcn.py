@@ -25,6 +25,8 @@ import ligo.skymap.bayestar as ligo_bayestar
 from mocpy.mocpy import flatten_pixels
 from mocpy import MOC
 
+from .healpix import reorder
+
 
 def get_trigger(root):
     """Get the trigger ID from a GCN notice."""
@@ -372,10 +374,10 @@ def from_bytes(arr):
         if occulted is not None:
             order = hp.nside2order(nside)
             skymap_flat = ligo_bayestar.rasterize(skymap, order)['PROB']
-            skymap_flat = hp.reorder(skymap_flat, 'NESTED', 'RING')
+            skymap_flat = reorder(skymap_flat)
             skymap_flat[occulted] = 0.0
             skymap_flat = skymap_flat / skymap_flat.sum()
-            skymap_flat = hp.reorder(skymap_flat, 'RING', 'NESTED')
+            skymap_flat = reorder(skymap_flat, r2n=True)
             skymap = ligo_bayestar.derasterize(Table([skymap_flat], names=['PROB']))
 
         skymap = {
@@ -429,10 +431,10 @@ def from_url(url):
     if occulted is not None:
         order = hp.nside2order(nside)
         skymap_flat = ligo_bayestar.rasterize(skymap, order)['PROB']
-        skymap_flat = hp.reorder(skymap_flat, 'NESTED', 'RING')
+        skymap_flat = reorder(skymap_flat)
         skymap_flat[occulted] = 0.0
         skymap_flat = skymap_flat / skymap_flat.sum()
-        skymap_flat = hp.reorder(skymap_flat, 'RING', 'NESTED')
+        skymap_flat = reorder(skymap_flat, r2n=True)
         skymap = ligo_bayestar.derasterize(Table([skymap_flat], names=['PROB']))
 
     skymap = {
@@ -456,7 +458,7 @@ def get_contour(localization):
     # Construct contours and return as a GeoJSON feature collection.
     levels = [50, 90]
     paths = ligo.skymap.postprocess.contour(cls, levels, degrees=True, simplify=True)
-    center = ligo.skymap.postprocess.posterior_max(prob)
+    center = localization.posterior_max()
     localization.contour = {
         'type': 'FeatureCollection',
         'features': [
@@ -0,0 +1,198 @@
+import functools
+import threading
+
+import healpy
+import ligo.skymap.distance
+import ligo.skymap.moc
+import numpy as np
+
+# The numba kernels are in healpix_kernels, which is only imported when a
+# map is first rasterized or reordered, so that importing this module does
+# not import and initialize numba.
+
+# The kernels are called from executor threads, e.g. when the contours and
+# the tiles of a new localization are computed together. Unless numba has a
+# threadsafe threading layer (tbb or omp), concurrent calls to parallel
+# kernels abort the process, so launches are serialized; the GIL is still
+# released while a kernel runs.
+_KERNEL_LOCK = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def nest2ring_table(order):
+    """Get the NESTED to RING permutation at a HEALPix order.
+
+    The table is computed once per order and must not be modified.
+    """
+    nside = healpy.order2nside(order)
+    table = healpy.nest2ring(nside, np.arange(healpy.nside2npix(nside)))
+    table = table.astype(np.int32)
+    table.flags.writeable = False
+    return table
+
+
+def reorder(values, r2n=False):
+    """Reorder HEALPix maps between NESTED and RING ordering.
+
+    This is equivalent to ``healpy.reorder``, but uses a cached permutation
+    table and permutes all of the maps in one multithreaded pass with the
+    GIL released.
+
+    Parameters
+    ----------
+    values : `numpy.ndarray`
+        A map, or an array of shape (nmaps, npix) of maps.
+    r2n : bool
+        Convert from RING to NESTED ordering; the default is from NESTED
+        to RING.
+
+    Returns
+    -------
+    `numpy.ndarray`
+        The reordered maps, with the same shape as ``values``.
+    """
+    from . import healpix_kernels
+
+    values = np.asarray(values)
+    maps = np.atleast_2d(values)
+    nest2ring = nest2ring_table(healpy.nside2order(healpy.npix2nside(maps.shape[1])))
+    out = np.empty_like(maps)
+    with _KERNEL_LOCK:
+        if r2n:
+            healpix_kernels.gather(maps, nest2ring, out)
+        else:
+            healpix_kernels.scatter(maps, nest2ring, out)
+    return out.reshape(values.shape)
+
+
+_CUDA_AVAILABLE = None
+
+
+def _use_cuda():
+    """Whether to rasterize maps on the GPU."""
+    global _CUDA_AVAILABLE
+    if _CUDA_AVAILABLE is None:
+        try:
+            from numba import cuda
+
+            _CUDA_AVAILABLE = cuda.is_available()
+        except Exception:
+            _CUDA_AVAILABLE = False
+    return _CUDA_AVAILABLE
+
+
+def rasterize(uniq, values, order, nest2ring):
+    """Rasterize a multi-order HEALPix dataset to a fixed-order RING map.
+
+    This is equivalent to ``ligo.skymap.moc.rasterize`` followed by
+    ``healpy.reorder(..., 'NESTED', 'RING')``, but writes the RING ordered
+    output in a single pass. Maps are rasterized on the GPU when CUDA is
+    available.
+
+    Parameters
+    ----------
+    uniq : `numpy.ndarray`
+        NUNIQ pixel indices of the multi-order dataset.
+    values : `numpy.ndarray`
+        Array of shape (ncols, len(uniq)) with the per-tile values of each
+        column. Tiles finer than ``order`` are averaged into their parent,
+        on the CPU and on the GPU alike, so the columns must be quantities
+        that average linearly; distance layers go through `rasterize_3d`.
+        float32 values give a float32 map; anything else is rasterized in
+        float64.
+    order : int
+        HEALPix order of the output map.
+    nest2ring : `numpy.ndarray`
+        NESTED to RING permutation at ``order``.
+
+    Returns
+    -------
+    `numpy.ndarray`
+        Array of shape (ncols, 12 * 4**order) in RING ordering. Pixels not
+        covered by any tile are zero.
+    """
+    uniq = np.asarray(uniq, dtype=np.int64)
+    values = np.atleast_2d(np.asarray(values))
+    if values.dtype != np.float32:
+        values = np.asarray(values, dtype=np.float64)
+    out = np.zeros((values.shape[0], nest2ring.size), dtype=values.dtype)
+    if _use_cuda():
+        # numba.cuda is only imported, and the kernel compiled, on first use
+        from .healpix_cuda import rasterize_on_device
+
+        rasterize_on_device(uniq, values, order, nest2ring, out)
+    else:
+        from . import healpix_kernels
+
+        with _KERNEL_LOCK:
+            healpix_kernels.rasterize(uniq, values, order, nest2ring, out)
+    return out
+
+
+def rasterize_3d(
+    uniq, probdensity, distmu, distsigma, distnorm, order, nest2ring, prob=None
+):
+    """Rasterize a multi-order 3D skymap to fixed-order RING maps.
+
+    This is equivalent to ``ligo.skymap.bayestar.rasterize`` followed by
+    ``healpy.reorder(..., 'NESTED', 'RING')``. The distance parameters of
+    tiles finer than ``order`` cannot be averaged directly, so when there
+    are such tiles the distance is rasterized as probability weighted
+    moments, which are converted back to distance parameters afterwards.
+
+    Parameters
+    ----------
+    uniq, probdensity, distmu, distsigma, distnorm : `numpy.ndarray`
+        Columns of the multi-order skymap.
+    order : int
+        HEALPix order of the output maps.
+    nest2ring : `numpy.ndarray`
+        NESTED to RING permutation at ``order``.
+    prob : `numpy.ndarray`, optional
+        Probability map already rasterized from ``uniq`` and
+        ``probdensity``, which is then reused rather than rasterized again.
+
+    Returns
+    -------
+    tuple of `numpy.ndarray`
+        Maps of the probability per pixel, DISTMU, DISTSIGMA and DISTNORM,
+        in RING ordering. The maps are rasterized in float64 even from
+        float32 columns, since the probability map is summed over millions
+        of pixels downstream.
+    """
+    uniq = np.asarray(uniq, dtype=np.int64)
+    probdensity = np.asarray(probdensity, dtype=np.float64)
+    pixarea = 4 * np.pi / nest2ring.size
+    downsampling = uniq.size > 0 and ligo.skymap.moc.uniq2order(uniq.max()) > order
+
+    if downsampling:
+        distmu = np.asarray(distmu)
+        distsigma = np.asarray(distsigma)
+        bad = ~(np.isfinite(distmu) & np.isfinite(distsigma))
+        distmean, diststd, _ = ligo.skymap.distance.parameters_to_moments(
+            distmu, distsigma
+        )
+        distmean[bad] = 0
+        diststd[bad] = 0
+        columns = [
+            probdensity * distmean,
+            probdensity * (np.square(diststd) + np.square(distmean)),
+        ]
+    else:
+        columns = [distmu, distsigma, distnorm]
+
+    if prob is None:
+        prob, *dist = rasterize(
+            uniq, [probdensity * pixarea, *columns], order, nest2ring
+        )
+    else:
+        dist = rasterize(uniq, columns, order, nest2ring)
+
+    if downsampling:
+        flat_probdensity = prob / pixarea
+        with np.errstate(divide='ignore', invalid='ignore'):
+            distmean = dist[0] / flat_probdensity
+            diststd = np.sqrt(dist[1] / flat_probdensity - np.square(distmean))
+        dist = ligo.skymap.distance.moments_to_parameters(distmean, diststd)
+
+    return (prob, *dist)
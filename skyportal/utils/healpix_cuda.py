@@ -0,0 +1,115 @@
+import numba
+from numba import cuda
+import numpy as np
+
+from .healpix_kernels import uniq2nest
+
+
+_uniq2nest_device = cuda.jit(device=True)(uniq2nest.py_func)
+
+
+@numba.njit(cache=True)
+def _coarse_ranges(uniq, order):
+    """Get the ranges of NESTED pixels at order covered by the tiles at or
+    coarser than order, sorted by their first pixel, with the index of the
+    tile of each range."""
+    starts = np.empty(uniq.size, dtype=np.int64)
+    ends = np.empty(uniq.size, dtype=np.int64)
+    index = np.empty(uniq.size, dtype=np.int64)
+    n = 0
+    for i in range(uniq.size):
+        tile_order, ipix = uniq2nest(uniq[i])
+        if tile_order > order:
+            continue
+        shift = 2 * (order - tile_order)
+        starts[n] = ipix << shift
+        ends[n] = (ipix + 1) << shift
+        index[n] = i
+        n += 1
+    perm = np.argsort(starts[:n])
+    return starts[:n][perm], ends[:n][perm], index[:n][perm]
+
+
+@cuda.jit
+def _fill_pixels_cuda(starts, ends, index, values, nest2ring, out):
+    # One thread per output pixel, which finds the tile covering it by
+    # binary search, so that the pixels of coarse tiles are spread over
+    # many threads. Every pixel is written, zero where no tile covers it.
+    p = cuda.grid(1)
+    if p >= nest2ring.size:
+        return
+    lo = 0
+    hi = starts.size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if starts[mid] <= p:
+            lo = mid + 1
+        else:
+            hi = mid
+    k = lo - 1
+    r = nest2ring[p]
+    for c in range(values.shape[0]):
+        if k >= 0 and p < ends[k]:
+            out[c, r] = values[c, index[k]]
+        else:
+            out[c, r] = 0
+
+
+@cuda.jit
+def _add_fine_tiles_cuda(uniq, values, order, nest2ring, out):
+    # One thread per tile; tiles finer than the output order share their
+    # parent pixel, so they accumulate atomically.
+    i = cuda.grid(1)
+    if i >= uniq.size:
+        return
+    tile_order, ipix = _uniq2nest_device(uniq[i])
+    if tile_order <= order:
+        return
+    shift = 2 * (tile_order - order)
+    r = nest2ring[ipix >> shift]
+    weight = 1.0 / (1 << shift)
+    for c in range(values.shape[0]):
+        cuda.atomic.add(out, (c, r), values[c, i] * weight)
+
+
+# device copies of read-only permutation tables (those from nest2ring_table),
+# keyed by the identity of the host table, which is kept alive with them
+_DEVICE_NEST2RING = {}
+
+
+def _device_nest2ring(nest2ring):
+    if nest2ring.flags.writeable:
+        return cuda.to_device(nest2ring)
+    key = id(nest2ring)
+    if key not in _DEVICE_NEST2RING:
+        _DEVICE_NEST2RING[key] = (nest2ring, cuda.to_device(nest2ring))
+    return _DEVICE_NEST2RING[key][1]
+
+
+def _blocks(n, threads):
+    return max((n + threads - 1) // threads, 1)
+
+
+def rasterize_on_device(uniq, values, order, nest2ring, out):
+    """Rasterize a multi-order HEALPix dataset on the GPU into out, as
+    ``skyportal.utils.healpix.rasterize`` does on the CPU."""
+    starts, ends, index = _coarse_ranges(uniq, order)
+    device_nest2ring = _device_nest2ring(nest2ring)
+    device_values = cuda.to_device(values)
+    device_out = cuda.device_array(out.shape, dtype=out.dtype)
+    threads = 256
+
+    _fill_pixels_cuda[_blocks(nest2ring.size, threads), threads](
+        cuda.to_device(starts),
+        cuda.to_device(ends),
+        cuda.to_device(index),
+        device_values,
+        device_nest2ring,
+        device_out,
+    )
+    if starts.size < uniq.size:
+        _add_fine_tiles_cuda[_blocks(uniq.size, threads), threads](
+            cuda.to_device(uniq), device_values, order, device_nest2ring, device_out
+        )
+
+    device_out.copy_to_host(out)
@@ -0,0 +1,129 @@
+import numba
+import numpy as np
+
+
+@numba.njit(cache=True)
+def uniq2nest(uniq):
+    """Decode a NUNIQ pixel index into its HEALPix order and NESTED index."""
+    order = 0
+    while uniq >= np.int64(16) << np.int64(2 * order):
+        order += 1
+    return order, uniq - (np.int64(4) << np.int64(2 * order))
+
+
+# Ring number and longitude index of the base pixels, as used in the
+# HEALPix xyf2ring conversion.
+_JRLL = np.array([2, 2, 2, 2, 3, 3, 3, 3, 4, 4, 4, 4], dtype=np.int64)
+_JPLL = np.array([1, 3, 5, 7, 0, 2, 4, 6, 1, 3, 5, 7], dtype=np.int64)
+
+
+@numba.njit(cache=True)
+def _compress_bits(v):
+    """Collect the even bits of a NESTED index into a face coordinate."""
+    result = np.int64(0)
+    bit = np.int64(0)
+    while v:
+        result |= (v & 1) << bit
+        v >>= 2
+        bit += 1
+    return result
+
+
+@numba.njit(cache=True)
+def _ring_info(nside, ring):
+    """Get the index of the first pixel of a (1-based) ring, the number of
+    pixels per quadrant in the ring, and whether the ring is shifted."""
+    if ring < nside:
+        nr = ring
+        start = 2 * nr * (nr - 1)
+        kshift = 0
+    elif ring > 3 * nside:
+        nr = 4 * nside - ring
+        start = 12 * nside * nside - 2 * (nr + 1) * nr
+        kshift = 0
+    else:
+        nr = nside
+        start = 2 * nside * (nside - 1) + (ring - nside) * 4 * nside
+        kshift = (ring - nside) & 1
+    return start, nr, kshift
+
+
+@numba.njit(cache=True)
+def _fill_tile(face, x, y, side, nside, value, out):
+    """Write value into every RING pixel of a square block of side pixels
+    starting at face coordinates (x, y).
+
+    Along each diagonal ix + iy = s the block lies on a single ring, where
+    its pixels are consecutive (wrapping once around the ring for blocks
+    straddling longitude zero), so each diagonal is a slice assignment.
+    """
+    for s in range(x + y, x + y + 2 * side - 1):
+        ix = max(x, s - (y + side - 1))
+        n = min(x + side - 1, s - y) - ix + 1
+        start, nr, kshift = _ring_info(nside, _JRLL[face] * nside - s - 1)
+        first = (_JPLL[face] * nr + 2 * ix - s + 1 + kshift) // 2 - 1
+        length = 4 * nr
+        if first < 0:
+            first += length
+        m = min(n, length - first)
+        out[start + first : start + first + m] = value
+        if m < n:
+            out[start : start + n - m] = value
+
+
+@numba.njit(parallel=True, nogil=True, cache=True)
+def rasterize(uniq, values, order, nest2ring, out):
+    """Rasterize a multi-order dataset into the RING ordered map out."""
+    ncols = values.shape[0]
+    nside = np.int64(1) << order
+
+    # Tiles at or coarser than the output order cover disjoint sets of
+    # pixels, so they can be written in parallel.
+    for i in numba.prange(uniq.size):
+        tile_order, ipix = uniq2nest(uniq[i])
+        if tile_order > order:
+            continue
+        if tile_order == order:
+            r = nest2ring[ipix]
+            for c in range(ncols):
+                out[c, r] = values[c, i]
+            continue
+        # Coarser tiles are filled ring by ring in closed form rather than
+        # looking up each of their pixels in nest2ring.
+        face = ipix >> (2 * tile_order)
+        p = ipix & ((np.int64(1) << (2 * tile_order)) - 1)
+        side = np.int64(1) << (order - tile_order)
+        x = _compress_bits(p) * side
+        y = _compress_bits(p >> 1) * side
+        for c in range(ncols):
+            _fill_tile(face, x, y, side, nside, values[c, i], out[c])
+
+    # Tiles finer than the output order are averaged into their parent pixel;
+    # several tiles share a parent, so accumulate serially.
+    for i in range(uniq.size):
+        tile_order, ipix = uniq2nest(uniq[i])
+        if tile_order <= order:
+            continue
+        shift = np.int64(2 * (tile_order - order))
+        r = nest2ring[ipix >> shift]
+        weight = 1.0 / (np.int64(1) << shift)
+        for c in range(ncols):
+            out[c, r] += values[c, i] * weight
+
+
+@numba.njit(parallel=True, nogil=True, cache=True)
+def scatter(values, index, out):
+    """Write column i of values to column index[i] of out."""
+    for i in numba.prange(index.size):
+        j = index[i]
+        for c in range(values.shape[0]):
+            out[c, j] = values[c, i]
+
+
+@numba.njit(parallel=True, nogil=True, cache=True)
+def gather(values, index, out):
+    """Write column index[i] of values to column i of out."""
+    for i in numba.prange(index.size):
+        j = index[i]
+        for c in range(values.shape[0]):
+            out[c, i] = values[c, j]